@@ -1,10 +1,21 @@
 from enum import Enum
 
-import win32com.client as win32
-from sys import stderr
+from sys import argv, stderr
 from csv import reader
 from pathlib import Path
-from typing import NamedTuple, Any, Generator
+from concurrent.futures import Future, ThreadPoolExecutor
+from json import JSONDecodeError, dump, load
+from fnmatch import fnmatch
+from types import ModuleType
+from argparse import ArgumentParser, ArgumentTypeError, BooleanOptionalAction
+from threading import Lock
+from functools import partial, reduce
+from collections import deque
+from multiprocessing import get_context
+from multiprocessing.queues import Queue
+from multiprocessing.process import BaseProcess
+from multiprocessing.connection import Connection, wait
+from typing import NamedTuple, Any, Callable, Generator, Protocol
 
 SIZE_LEN_TENDENCY_ARROW: float = 515.0
 SIZE_LEN_DISTRIBUTION_ARROW: float = 600.0
@@ -13,8 +24,52 @@ SIZE_VIS_CIRCLE: float = 170.0
 EXPORT_PREFIX: str = "afterlife-"
 EXPORT_SUFFIX: str = ""
 TARGET_LAYER: str = "Working"
+EXPORT_LAYERED: bool = False
 
+FILE_TEMPLATE: Path = Path(__file__).parent.joinpath("sinsandvirtues.ai")
 DIR_OUTPUT: Path = Path(__file__).parent.joinpath("output")
+DIR_LAYERS: Path = DIR_OUTPUT.joinpath(".layers")
+
+# how different (0-255) a pixel can be between a layered and a normal export,
+# and how much of the image can be more different than that, see Compositor
+VERIFY_TOLERANCE: int = 32
+VERIFY_THRESHOLD: float = 0.001
+
+PAIR_GROUPS: tuple[str, ...] = (
+    "LustChastity",
+    "GluttonyTemperance",
+    "GreedCharity",
+    "SlothDiligence",
+    "WrathPatience",
+    "EnvyKindness",
+    "PrideHumility",
+)
+
+# items that change per person, by the group they live in under the target layer
+# - shapes are kept in every variant
+# - scores, numbers and arrows are only kept in the main export
+DYNAMIC_SHAPES: dict[str, tuple[str, ...]] = {
+    "Header": ("TargetName",),
+    **{
+        pair: tuple(f"{side}{idx}" for side in ("Left", "Right") for idx in range(1, 7))
+        for pair in PAIR_GROUPS
+    },
+}
+DYNAMIC_MAIN_ONLY: dict[str, tuple[str, ...]] = {
+    "Numbers": ("All", "Male", "Female", "Other"),
+    **{
+        pair: (
+            "LeftScore",
+            "RightScore",
+            "SumScore",
+            "LeftMakeup",
+            "RightMakeup",
+            "LeftTendency",
+            "RightTendency",
+        )
+        for pair in PAIR_GROUPS
+    },
+}
 
 
 class AfterlifeValues(NamedTuple):
@@ -55,6 +110,22 @@ class InformationOriginType(Enum):
     OTHER = "other pure"
 
 
+class Layout(NamedTuple):
+    # a design to render everyone with, and what to name its exports
+    target_layer: str = TARGET_LAYER
+    prefix: str = EXPORT_PREFIX
+    suffix: str = EXPORT_SUFFIX
+
+    @staticmethod
+    def parse(spec: str) -> "Layout":
+        # 'TargetLayer[:prefix[:suffix]]', e.g. 'WorkingAlt::-alt',
+        # where anything left blank is its default
+        parts = spec.split(":", 2)
+        return Layout(
+            *(part if part != "" else default for part, default in zip(parts, Layout()))
+        )
+
+
 class AiTransformation(Enum):
     # https://citeseerx.ist.psu.edu/document?repid=rep1&type=pdf&doi=7d83f8592174c956d45892b11e310e5db5e45353, page 267
     aiTransformBottom = 7
@@ -178,9 +249,372 @@ def parse_csv(path: Path) -> Generator[AfterlifeInformation, None, None]:
         )
 
 
-def printingpress(data: AfterlifeInformation, document: Any) -> None:
+def win32() -> ModuleType:
+    # win32com is only imported once a com backend is actually used,
+    # so parsing and dry runs start fast (and work outside of windows)
+    import win32com.client
+
+    return win32com.client
+
+
+def iter_items(collection: Any) -> Generator[Any, None, None]:
+    # com collections are 1-indexed, and iterating over them directly is unreliable
+    for idx in range(1, collection.Count + 1):
+        yield collection(idx)
+
+
+def find_artboard(document: Any, target_layer: str) -> int:
+    # exports are clipped to the active artboard, so find the one under the
+    # middle of everything in the target layer
+    layer = document.Layers(target_layer)
+    bounds = [item.VisibleBounds for item in iter_items(layer.PageItems)]
+    assert len(bounds) > 0, f"target layer '{target_layer}' is empty"
+
+    # bounds are (left, top, right, bottom), with y going up
+    x = (min(b[0] for b in bounds) + max(b[2] for b in bounds)) / 2
+    y = (max(b[1] for b in bounds) + min(b[3] for b in bounds)) / 2
+
+    for idx, artboard in enumerate(iter_items(document.Artboards)):
+        left, top, right, bottom = artboard.ArtboardRect
+        if left <= x <= right and bottom <= y <= top:
+            # 0-indexed, unlike the collection itself, as SetActiveArtboardIndex wants
+            return idx
+
+    raise ValueError(f"target layer '{target_layer}' is not on any artboard")
+
+
+def export_filename(layout: Layout, name: str, additional: str = "") -> str:
+    return f"{layout.prefix}{name}{layout.suffix}{additional}.png"
+
+
+def export_png(document: Any, path: Path, transparent: bool = False) -> None:
+    # define export options
+    options = win32().Dispatch("Illustrator.ExportOptionsPNG24")
+    options.AntiAliasing = True
+    options.ArtBoardClipping = True
+    options.Transparency = transparent
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    document.Export(
+        path,
+        5,  # png
+        options,
+    )
+
+
+def is_dynamic(group: str, item: Any, main: bool = True) -> bool:
+    return (item.Name in DYNAMIC_SHAPES.get(group, ())) or (
+        main and (item.Name in DYNAMIC_MAIN_ONLY.get(group, ()))
+    )
+
+
+def is_label(group: str, item: Any) -> bool:
+    # the numbers and the sin/virtue names next to the scores,
+    # hidden in both variants alongside the main-only dynamic items
+    return (group == "Numbers") or (
+        group in PAIR_GROUPS and item.Name in ("Left", "Right")
+    )
+
+
+def is_blend(group: str, item: Any) -> bool:
+    # the 'blend' object group has no name, see printingpress()
+    return group == "" and item.Typename == "PluginItem"
+
+
+# what is shown when exporting the static template for each export variant,
+# keyed by the additional part of the export filename
+STATIC_VARIANTS: dict[str, Callable[[str, Any], bool]] = {
+    "": lambda group, item: not is_dynamic(group, item),
+    "-var2": lambda group, item: not (is_dynamic(group, item) or is_label(group, item)),
+    "-var1": lambda group, item: not (
+        is_dynamic(group, item) or is_label(group, item) or is_blend(group, item)
+    ),
+}
+
+
+# what is shown when exporting the dynamic layers on their own, keyed by the
+# additional part of their filenames. nothing from other layers is shown
+DYNAMIC_VARIANTS: dict[str, Callable[[str, Any], bool]] = {
+    "-dynamic": is_dynamic,
+    "-dynamic-shapes": lambda group, item: is_dynamic(group, item, main=False),
+}
+
+
+class Staging(NamedTuple):
+    # everything the compositor toggles for a target layer: (item, attribute)
+    items: tuple[tuple[Any, str], ...]
+    # the value of each attribute in the template
+    template: tuple[bool, ...]
+    # and when exporting each static and dynamic variant
+    variants: dict[str, tuple[bool, ...]]
+
+
+def plan_staging(document: Any, target_layer: str) -> Staging:
+    # walks the target layer once, descending one level into the groups the script
+    # knows about, and works out what every variant hides. items already hidden in
+    # the template stay hidden, as they do in normal exports
+    groups = DYNAMIC_SHAPES.keys() | DYNAMIC_MAIN_ONLY.keys()
+    items: list[tuple[Any, str]] = []
+    template: list[bool] = []
+    shows: list[tuple[str, Any] | None] = []
+
+    for layer in iter_items(document.Layers):
+        if layer.Name != target_layer:
+            items.append((layer, "Visible"))
+            template.append(layer.Visible)
+            shows.append(None)
+
+    for item in iter_items(document.Layers(target_layer).PageItems):
+        if item.Name not in groups:
+            items.append((item, "Hidden"))
+            template.append(item.Hidden)
+            shows.append(("", item))
+            continue
+
+        for child in iter_items(item.PageItems):
+            items.append((child, "Hidden"))
+            template.append(child.Hidden)
+            shows.append((item.Name, child))
+
+    def variant(
+        shown: Callable[[str, Any], bool], other_layers: bool
+    ) -> tuple[bool, ...]:
+        return tuple(
+            (value and other_layers)
+            if show is None
+            else (value or not shown(*show))
+            for value, show in zip(template, shows)
+        )
+
+    return Staging(
+        items=tuple(items),
+        template=tuple(template),
+        variants={
+            **{key: variant(shown, True) for key, shown in STATIC_VARIANTS.items()},
+            **{key: variant(shown, False) for key, shown in DYNAMIC_VARIANTS.items()},
+        },
+    )
+
+
+class Compositor:
+    # layered exports: the static parts of a template (background, labels, pair
+    # artwork) are exported by illustrator once, and per person only the dynamic
+    # parts are exported on a transparent background, which are then
+    # alpha-composited over the static exports on a thread pool
+    #
+    # this only holds up if nothing static is drawn over the dynamic items and the
+    # dynamic items use normal blending, so the first person on every template is
+    # also exported normally and compared against, see verify()
+
+    def __init__(self, layers: Path = DIR_LAYERS, workers: int | None = None) -> None:
+        # pillow is only needed for layered exports
+        from PIL import Image, ImageChops
+
+        # where the static and dynamic exports go, one per session so that
+        # sessions sharing a drive don't overwrite what another is reading
+        self.layers = layers
+        self.image = Image
+        self.chops = ImageChops
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.static: dict[tuple[str, str], Path] = {}
+        self.verified: set[str] = set()
+        # the last person's dynamic exports for every target layer, reused by
+        # layouts sharing a target layer: (name, (all, shapes only))
+        self.dynamic: dict[str, tuple[str, tuple[Path, Path]]] = {}
+        # what to toggle for every target layer, and how each one is staged now
+        self.staging: dict[str, Staging] = {}
+        self.current: dict[str, tuple[bool, ...]] = {}
+
+    def prepare(self, document: Any, target_layer: str) -> None:
+        if target_layer not in self.staging:
+            self.restore()
+            self.staging[target_layer] = plan_staging(document, target_layer)
+
+        for additional in STATIC_VARIANTS:
+            if (target_layer, additional) in self.static:
+                continue
+
+            path = self.layers.joinpath(f"{target_layer}-static{additional}.png")
+            print(
+                f"afterlife.compositor: exporting static template '{path.name}'...",
+                file=stderr,
+                flush=True,
+            )
+
+            self.stage(target_layer, additional)
+            export_png(document, path)
+            self.static[(target_layer, additional)] = path
+
+    def submit(self, document: Any, layout: Layout, name: str) -> list[Future[Path]]:
+        target_layer = layout.target_layer
+        self.prepare(document, target_layer)
+
+        if self.exported(target_layer, name):
+            dynamic_all, dynamic_shapes = self.dynamic[target_layer][1]
+        else:
+            dynamic_all, dynamic_shapes = self.export_dynamic(
+                document, target_layer, name
+            )
+
+        # until a template is verified, composite next to the intermediates
+        # instead, as the normal exports are what they get compared against
+        destination = (
+            DIR_OUTPUT
+            if target_layer in self.verified
+            else self.layers.joinpath(f"{target_layer}-check")
+        )
+
+        futures: list[Future[Path]] = [
+            self.pool.submit(
+                self.composite,
+                self.static[(target_layer, additional)],
+                overlay,
+                destination.joinpath(export_filename(layout, name, additional)),
+            )
+            for additional, overlay in [
+                ("", dynamic_all),
+                ("-var2", dynamic_shapes),
+                ("-var1", dynamic_shapes),
+            ]
+        ]
+        return futures
+
+    def exported(self, target_layer: str, name: str) -> bool:
+        return target_layer in self.dynamic and self.dynamic[target_layer][0] == name
+
+    def export_dynamic(
+        self, document: Any, target_layer: str, name: str
+    ) -> tuple[Path, Path]:
+        dynamic_all = self.layers.joinpath(f"{target_layer}-{name}-dynamic.png")
+        dynamic_shapes = self.layers.joinpath(
+            f"{target_layer}-{name}-dynamic-shapes.png"
+        )
+
+        print(
+            f"afterlife.compositor({name}): exporting dynamic layers...",
+            file=stderr,
+            flush=True,
+        )
+
+        # shapes first, so that the target layer stays staged with every dynamic
+        # item shown for printingpress() to set on the next person
+        self.stage(target_layer, "-dynamic-shapes")
+        export_png(document, dynamic_shapes, transparent=True)
+        self.stage(target_layer, "-dynamic")
+        export_png(document, dynamic_all, transparent=True)
+
+        self.dynamic[target_layer] = (name, (dynamic_all, dynamic_shapes))
+        return dynamic_all, dynamic_shapes
+
+    def stage(self, target_layer: str, variant: str | None) -> None:
+        # only toggles what differs from how the target layer is staged right now,
+        # so going from one person's dynamic exports to the next touches nothing
+        # but the variant differences. None stages it as it is in the template
+        if variant is not None:
+            self.restore(keep=target_layer)
+
+        staging = self.staging[target_layer]
+        values = staging.template if variant is None else staging.variants[variant]
+        current = self.current.get(target_layer, staging.template)
+
+        for (item, attribute), value, was in zip(staging.items, values, current):
+            if value != was:
+                setattr(item, attribute, value)
+
+        self.current[target_layer] = values
+
+    def restore(self, keep: str | None = None) -> None:
+        # puts every staged target layer but keep back as it is in the template,
+        # for normal exports and before working on another target layer (whose
+        # layer would otherwise be hidden)
+        for target_layer in list(self.current):
+            if target_layer != keep:
+                self.stage(target_layer, None)
+                del self.current[target_layer]
+
+    def composite(self, base: Path, overlay: Path, destination: Path) -> Path:
+        with self.image.open(base) as _base, self.image.open(overlay) as _overlay:
+            image = self.image.alpha_composite(
+                _base.convert("RGBA"), _overlay.convert("RGBA")
+            )
+
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        image.convert("RGB").save(destination)
+
+        print(
+            f"afterlife.compositor: composited '{destination.name}'",
+            file=stderr,
+            flush=True,
+        )
+        return destination
+
+    def verify(self, layout: Layout, name: str, futures: list[Future[Path]]) -> None:
+        # compares a person's composites against their normal exports, failing if
+        # more than a sliver of pixels (antialiased edges, mostly) differ by much
+        for future in futures:
+            layered = future.result()
+            normal = DIR_OUTPUT.joinpath(layered.name)
+
+            with (
+                self.image.open(layered) as _layered,
+                self.image.open(normal) as _normal,
+            ):
+                if _layered.size != _normal.size:
+                    raise RuntimeError(
+                        f"layered export '{layered.name}' is {_layered.size} "
+                        f"but the normal export is {_normal.size}"
+                    )
+
+                # the largest difference in any channel, as luminance would all
+                # but ignore a difference in blue
+                difference = reduce(
+                    self.chops.lighter,
+                    self.chops.difference(
+                        _layered.convert("RGB"), _normal.convert("RGB")
+                    ).split(),
+                )
+
+            changed = sum(difference.histogram()[VERIFY_TOLERANCE:])
+            if changed / (difference.width * difference.height) > VERIFY_THRESHOLD:
+                raise RuntimeError(
+                    f"layered export '{layered.name}' differs from the normal export "
+                    f"in {changed} pixels, something static is probably drawn over "
+                    f"a dynamic item in '{layout.target_layer}' (or one of them isn't "
+                    "normally blended), don't use layered exports with it"
+                )
+
+        print(
+            f"afterlife.compositor({name}): layered exports of "
+            f"'{layout.target_layer}' match the normal exports",
+            file=stderr,
+            flush=True,
+        )
+        self.verified.add(layout.target_layer)
+
+    def finish(self) -> None:
+        # leave the document as it was, and wait for every composite,
+        # their errors are on their futures
+        self.restore()
+        self.pool.shutdown()
+
+
+def printingpress(
+    data: AfterlifeInformation,
+    document: Any,
+    layout: Layout = Layout(),
+    compositor: Compositor | None = None,
+) -> list[Future[Path]]:
+    # layouts sharing a target layer with one already done only need compositing
+    if compositor is not None and compositor.exported(layout.target_layer, data.name):
+        return compositor.submit(document, layout, data.name)
+
+    # other target layers may be staged with this one hidden
+    if compositor is not None:
+        compositor.restore(keep=layout.target_layer)
+
     # get groups
-    working_layer = document.Layers(TARGET_LAYER)
+    working_layer = document.Layers(layout.target_layer)
     header_layer = working_layer.GroupItems("Header")
     numbers_layer = working_layer.GroupItems("Numbers")
     vis_lust_chastity_layer = working_layer.GroupItems("LustChastity")
@@ -192,7 +626,7 @@ def printingpress(data: AfterlifeInformation, document: Any) -> None:
     vis_pride_humility_layer = working_layer.GroupItems("PrideHumility")
 
     print(
-        f"afterlife.printingpress({data.name}): operating on the document...",
+        f"afterlife.printingpress({data.name}): operating on '{layout.target_layer}'...",
         file=stderr,
         flush=True,
     )
@@ -253,7 +687,7 @@ def printingpress(data: AfterlifeInformation, document: Any) -> None:
         change_stroke_pattern: bool = False
         change_line_widths: float = 0.0
 
-        matrix = win32.Dispatch("Illustrator.Matrix")
+        matrix = win32().Dispatch("Illustrator.Matrix")
         matrix.MValueA = sx
         matrix.MValueB = 0.0
         matrix.MValueC = 0.0
@@ -552,9 +986,21 @@ def printingpress(data: AfterlifeInformation, document: Any) -> None:
                     )
                     z_order(arrow, idx)
 
+    # layered exports only need the dynamic parts from illustrator
+    futures: list[Future[Path]] = []
+    if compositor is not None:
+        futures = compositor.submit(document, layout, data.name)
+
+        if layout.target_layer in compositor.verified:
+            print(f"afterlife.printingpress({data.name}): done", file=stderr)
+            return futures
+
+        # else also export normally to compare against
+        compositor.restore()
+
     # the second final step: export
     def export(name: str, additional: str = "") -> None:
-        filename: str = f"{EXPORT_PREFIX}{name}{EXPORT_SUFFIX}{additional}.png"
+        filename: str = export_filename(layout, name, additional)
 
         print(
             f"afterlife.printingpress({data.name}): exporting '{filename}'...",
@@ -562,19 +1008,7 @@ def printingpress(data: AfterlifeInformation, document: Any) -> None:
             flush=True,
         )
 
-        # define export options
-        options = win32.Dispatch("Illustrator.ExportOptionsPNG24")
-        options.AntiAliasing = True
-        options.ArtBoardClipping = True
-        options.Transparency = False
-
-        DIR_OUTPUT.mkdir(exist_ok=True)
-
-        document.Export(
-            DIR_OUTPUT.joinpath(filename),
-            5,  # png
-            options,
-        )
+        export_png(document, DIR_OUTPUT.joinpath(filename))
 
     export(f"{data.name}")
 
@@ -642,19 +1076,513 @@ def printingpress(data: AfterlifeInformation, document: Any) -> None:
     hide_non_shapes(False)
     working_layer.PluginItems(1).Hidden = False
 
+    if compositor is not None:
+        compositor.verify(layout, data.name, futures)
+
     print(f"afterlife.printingpress({data.name}): done", file=stderr)
+    return []
+
+
+class ExportSettings(NamedTuple):
+    # what a renderer session exports everyone with, passed along to worker processes
+    layouts: list[Layout]
+    layered: bool = EXPORT_LAYERED
+    # opened by sessions without a document to work on, e.g. on other machines
+    template: Path = FILE_TEMPLATE
+
+
+def expected_outputs(layout: Layout, name: str) -> list[Path]:
+    return [
+        DIR_OUTPUT.joinpath(export_filename(layout, name, additional))
+        for additional in ("", "-var2", "-var1")
+    ]
+
+
+def gathered(futures: list[Future[Path]], outputs: list[Path]) -> Future[list[Path]]:
+    # a future for outputs that resolves once every one of futures has,
+    # failing with the first error if any of them did
+    result: Future[list[Path]] = Future()
+    remaining: int = len(futures)
+    lock = Lock()
+
+    def _done(_: Future[Path]) -> None:
+        nonlocal remaining
+        with lock:
+            remaining -= 1
+            if remaining > 0:
+                return
+
+        for future in futures:
+            if (exc := future.exception()) is not None:
+                result.set_exception(exc)
+                return
+        result.set_result(outputs)
+
+    if len(futures) == 0:
+        result.set_result(outputs)
+
+    for future in futures:
+        future.add_done_callback(_done)
+
+    return result
+
+
+class RendererSession(Protocol):
+    # render() returns once illustrator is free for the next person, with a future
+    # that resolves once the person's exports are all written
+    def render(self, data: AfterlifeInformation) -> Future[list[Path]]: ...
+
+    def close(self) -> None: ...
+
+
+class IllustratorSession:
+    # an illustrator instance, either the one running locally or one on another
+    # machine through dcom, rendering every layout into its active document, or
+    # the template if it has none (like every freshly launched remote instance)
+
+    def __init__(
+        self,
+        settings: ExportSettings,
+        machine: str | None = None,
+        layers: Path = DIR_LAYERS,
+    ) -> None:
+        if machine is None:
+            self.ai = win32().GetActiveObject("Illustrator.Application")
+        else:
+            self.ai = win32().DispatchEx("Illustrator.Application", machine)
+        assert self.ai, "could not hook into adobe illustrator"
+
+        # a document opened here has no artboard picked by hand
+        opened: bool = self.ai.Documents.Count == 0
+        if opened:
+            print(
+                f"afterlife: opening '{settings.template}'...",
+                file=stderr,
+                flush=True,
+            )
+            self.document = self.ai.Open(str(settings.template))
+        else:
+            self.document = self.ai.ActiveDocument
+
+        # and neither has more than one target layer. where everything is doesn't
+        # change within a session, so the artboards are only found once
+        target_layers = dict.fromkeys(
+            layout.target_layer for layout in settings.layouts
+        )
+        self.artboards: dict[str, int] = (
+            {
+                target_layer: find_artboard(self.document, target_layer)
+                for target_layer in target_layers
+            }
+            if opened or len(target_layers) > 1
+            else {}
+        )
+
+        self.settings = settings
+        self.compositor: Compositor | None = (
+            Compositor(layers) if settings.layered else None
+        )
+
+    def render(self, data: AfterlifeInformation) -> Future[list[Path]]:
+        futures: list[Future[Path]] = []
+        outputs: list[Path] = []
+
+        for layout in self.settings.layouts:
+            if self.artboards:
+                self.document.Artboards.SetActiveArtboardIndex(
+                    self.artboards[layout.target_layer]
+                )
+
+            futures += printingpress(
+                data,
+                document=self.document,
+                layout=layout,
+                compositor=self.compositor,
+            )
+            outputs += expected_outputs(layout, data.name)
+
+        # a person only counts as rendered once their composites are written,
+        # which happens while illustrator moves on to the next person
+        return gathered(futures, outputs)
+
+    def close(self) -> None:
+        if self.compositor is not None:
+            self.compositor.finish()
+
+
+class DryRunSession:
+    # a local stand-in renderer that touches nothing, for checking a batch
+    # (and the scheduler) without an illustrator licence
+
+    def __init__(self, settings: ExportSettings) -> None:
+        self.settings = settings
+
+    def render(self, data: AfterlifeInformation) -> Future[list[Path]]:
+        outputs: list[Path] = []
+
+        for layout in self.settings.layouts:
+            outputs += expected_outputs(layout, data.name)
+
+        print(
+            f"afterlife.dryrun({data.name}): would export",
+            ", ".join(f"'{path.name}'" for path in outputs),
+            file=stderr,
+            flush=True,
+        )
+        return gathered([], outputs)
+
+    def close(self) -> None:
+        pass
+
+
+def parse_spec(spec: str) -> tuple[str, str | None]:
+    # worker specs are 'com' (the local illustrator), 'com@machine' (illustrator
+    # on another machine) or 'dryrun'
+    backend, _, machine = spec.partition("@")
+    if backend not in ("com", "dryrun"):
+        raise ValueError(f"unknown renderer backend '{backend}' in '{spec}'")
+    if backend == "dryrun" and machine != "":
+        raise ValueError(f"'dryrun' can't be given a machine, in '{spec}'")
+    return backend, (machine if machine != "" else None)
+
+
+def open_session(
+    spec: str, settings: ExportSettings, layers: Path = DIR_LAYERS
+) -> RendererSession:
+    backend, machine = parse_spec(spec)
+    match backend:
+        case "com":
+            return IllustratorSession(settings, machine=machine, layers=layers)
+        case "dryrun":
+            return DryRunSession(settings)
+        case _:
+            assert False, "supposedly unreachable code"
+
+
+class WorkerReportType(Enum):
+    RENDERED = "rendered"
+    FAILED = "failed"
+    IDLE = "idle"
+    DEAD = "dead"
+
+
+class WorkerReport(NamedTuple):
+    worker: int
+    type: WorkerReportType
+    name: str = ""
+    outputs: tuple[str, ...] = ()
+    error: str = ""
+
+
+def renderer_worker(
+    worker: int,
+    spec: str,
+    settings: ExportSettings,
+    inbox: "Queue[list[AfterlifeInformation] | None]",
+    reports: Connection,
+) -> None:
+    # runs in its own process with its own renderer session, rendering shards
+    # from its inbox until it receives None
+    #
+    # reports go over a pipe rather than a queue as pipes send synchronously,
+    # so nothing that was reported gets lost if the process dies right after
+    lock = Lock()
+
+    def report(message: WorkerReport) -> None:
+        # composites finish (and get reported) from the compositor's threads
+        with lock:
+            reports.send(message)
+
+    def rendered(name: str, future: Future[list[Path]]) -> None:
+        if (exc := future.exception()) is not None:
+            report(WorkerReport(worker, WorkerReportType.FAILED, name, error=repr(exc)))
+        else:
+            report(
+                WorkerReport(
+                    worker,
+                    WorkerReportType.RENDERED,
+                    name,
+                    outputs=tuple(str(path) for path in future.result()),
+                )
+            )
+
+    try:
+        session = open_session(spec, settings, DIR_LAYERS.joinpath(f"worker-{worker}"))
+    except Exception as exc:
+        report(WorkerReport(worker, WorkerReportType.DEAD, error=repr(exc)))
+        return
+
+    while (shard := inbox.get()) is not None:
+        for person in shard:
+            try:
+                future = session.render(person)
+            except Exception as exc:
+                report(
+                    WorkerReport(
+                        worker, WorkerReportType.FAILED, person.name, error=repr(exc)
+                    )
+                )
+            else:
+                future.add_done_callback(partial(rendered, person.name))
+
+        # ready for more, even if the last few people are still compositing
+        report(WorkerReport(worker, WorkerReportType.IDLE))
+
+    session.close()
+
+
+def check_workers(workers: list[str]) -> None:
+    if len(workers) == 0:
+        raise ValueError("no workers to schedule on")
+
+    if [parse_spec(spec) for spec in workers].count(("com", None)) > 1:
+        # every local 'com' worker would hook into the same illustrator instance
+        raise ValueError("only one local 'com' worker can be used at a time")
+
+
+class Shard(NamedTuple):
+    people: list[AfterlifeInformation]
+    # workers that have already failed on this shard
+    excluded: frozenset[int] = frozenset()
+
+
+def schedule(
+    data: list[AfterlifeInformation],
+    workers: list[str],
+    settings: ExportSettings,
+    shard_size: int = 1,
+) -> dict[str, Any]:
+    # splits people into shards and hands them out to whichever worker is idle,
+    # retrying anyone who failed on a worker that hasn't failed them yet, and
+    # returns (and writes) the merged output manifest
+
+    # fail before spawning anything
+    check_workers(workers)
+
+    if shard_size < 1:
+        raise ValueError(f"shard size must be at least 1, not {shard_size}")
+
+    # spawn on every platform, com objects don't survive a fork anyway
+    context = get_context("spawn")
+    inboxes: list["Queue[list[AfterlifeInformation] | None]"] = []
+    receivers: dict[Connection, int] = {}
+    processes: list[BaseProcess] = []
+
+    for worker, spec in enumerate(workers):
+        inbox: "Queue[list[AfterlifeInformation] | None]" = context.Queue()
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(
+            target=renderer_worker,
+            args=(worker, spec, settings, inbox, sender),
+            name=f"afterlife-worker-{worker}",
+            daemon=True,
+        )
+        process.start()
+        # so the receiving end sees the pipe close once the worker is gone
+        sender.close()
+
+        inboxes.append(inbox)
+        receivers[receiver] = worker
+        processes.append(process)
+
+    pending: deque[Shard] = deque(
+        Shard(data[idx : idx + shard_size]) for idx in range(0, len(data), shard_size)
+    )
+    alive: set[int] = set(range(len(workers)))
+    idle: set[int] = set(range(len(workers)))
+    # people handed out but not reported on yet, and who to
+    inflight: dict[str, tuple[int, Shard]] = {}
+
+    rendered: dict[str, dict[str, Any]] = {}
+    failed: dict[str, list[str]] = {}
+    errors: dict[str, list[str]] = {}
+    attempts: dict[str, int] = {}
+
+    def progress(message: str) -> None:
+        done = len(rendered) + len(failed)
+        print(
+            f"afterlife.scheduler: [{done}/{len(data)}] {message}",
+            file=stderr,
+            flush=True,
+        )
 
+    def label(worker: int) -> str:
+        # specs can repeat, e.g. two 'dryrun' workers
+        return f"{workers[worker]} (worker {worker})"
+
+    def give_up(person: AfterlifeInformation) -> None:
+        failed[person.name] = errors.get(person.name, ["no workers left"])
+        progress(f"{person.name} has no workers left to try, giving up")
+
+    def retry(shard: Shard, worker: int, error: str) -> None:
+        # put everyone in the shard back onto the queue as their own shard,
+        # away from the worker that failed them
+        excluded = shard.excluded | {worker}
+        for person in shard.people:
+            errors.setdefault(person.name, []).append(f"{label(worker)}: {error}")
+            if alive - excluded:
+                pending.append(Shard([person], excluded))
+            else:
+                give_up(person)
+
+    def lost(worker: int, error: str) -> None:
+        # a worker is gone, retry everyone it still had
+        alive.discard(worker)
+        idle.discard(worker)
+        for name, (_worker, shard) in list(inflight.items()):
+            if _worker == worker:
+                del inflight[name]
+                retry(shard, worker, error)
+
+    try:
+        while pending or inflight:
+            # hand out work to idle workers, first come first served
+            for worker in sorted(idle):
+                shard = next((s for s in pending if worker not in s.excluded), None)
+                if shard is None:
+                    continue
+
+                pending.remove(shard)
+                inboxes[worker].put(shard.people)
+                idle.discard(worker)
+                for person in shard.people:
+                    inflight[person.name] = (worker, Shard([person], shard.excluded))
+                    attempts[person.name] = attempts.get(person.name, 0) + 1
+
+            if not inflight and alive <= idle:
+                # whatever is left has been excluded from every live worker
+                while pending:
+                    for person in pending.popleft().people:
+                        give_up(person)
+                break
+
+            for receiver in wait(list(receivers)):
+                assert isinstance(receiver, Connection)
+                worker = receivers[receiver]
+
+                try:
+                    report: WorkerReport = receiver.recv()
+                except EOFError:
+                    # the worker is gone, and everything it sent has been read
+                    del receivers[receiver]
+                    receiver.close()
+                    if worker in alive:
+                        processes[worker].join(timeout=1.0)
+                        progress(f"{label(worker)} exited unexpectedly")
+                        lost(worker, f"exited with code {processes[worker].exitcode}")
+                    continue
+
+                match report.type:
+                    case WorkerReportType.RENDERED:
+                        inflight.pop(report.name)
+                        rendered[report.name] = {
+                            "worker": worker,
+                            "spec": workers[worker],
+                            "attempts": attempts[report.name],
+                            "errors": errors.get(report.name, []),
+                            "outputs": list(report.outputs),
+                        }
+                        progress(f"{report.name} rendered on {label(worker)}")
+
+                    case WorkerReportType.FAILED:
+                        _, shard = inflight.pop(report.name)
+                        progress(
+                            f"{report.name} failed on {label(worker)}: {report.error}"
+                        )
+                        retry(shard, worker, report.error)
+
+                    case WorkerReportType.IDLE:
+                        idle.add(worker)
+
+                    case WorkerReportType.DEAD:
+                        progress(f"{label(worker)} could not start: {report.error}")
+                        lost(worker, report.error)
+
+                    case _:
+                        assert False, "supposedly unreachable code"
+
+    finally:
+        for worker in alive:
+            inboxes[worker].put(None)
+        for process in processes:
+            process.join(timeout=10.0)
+            if process.is_alive():
+                process.terminate()
+        for receiver in receivers:
+            receiver.close()
+
+    manifest: dict[str, Any] = {
+        "rendered": rendered,
+        "failed": failed,
+    }
+
+    DIR_OUTPUT.mkdir(exist_ok=True)
+    with open(DIR_OUTPUT.joinpath("manifest.json"), "w", encoding="utf-8") as file:
+        dump(manifest, file, indent=2)
+
+    return manifest
+
+
+def select_people(
+    data: list[AfterlifeInformation], patterns: list[str]
+) -> list[AfterlifeInformation]:
+    # names or globs, case-insensitive, keeping the order of the csv
+    for pattern in patterns:
+        if not any(fnmatch(i.name.lower(), pattern.lower()) for i in data):
+            print(f"afterlife: no one matches '{pattern}'", file=stderr)
+
+    return [
+        i
+        for i in data
+        if any(fnmatch(i.name.lower(), pattern.lower()) for pattern in patterns)
+    ]
+
+
+def press(
+    data: list[AfterlifeInformation],
+    settings: ExportSettings,
+    workers: list[str] | None = None,
+    backend: str = "com",
+    shard_size: int = 1,
+) -> bool:
+    # renders everyone with every layout, either over a single renderer session in
+    # one pass, or spread over workers; returns whether everyone got rendered
+    if workers:
+        print(
+            f"afterlife: scheduling over {len(workers)} workers...",
+            file=stderr,
+            flush=True,
+        )
+        manifest = schedule(data, workers, settings, shard_size=shard_size)
+        print(
+            f"afterlife: done, {len(manifest['rendered'])} rendered,",
+            f"{len(manifest['failed'])} failed",
+            file=stderr,
+        )
+        return len(manifest["failed"]) == 0
 
-def main() -> None:
     print(
-        "afterlife: hooking into illustrator...",
+        f"afterlife: hooking into '{backend}'...",
         file=stderr,
         flush=True,
     )
 
-    ai = win32.GetActiveObject("Illustrator.Application")
-    assert ai, "could not hook into adobe illustrator"
+    session = open_session(backend, settings)
+    try:
+        futures = [session.render(p) for p in data]
+    finally:
+        if settings.layered:
+            print("afterlife: waiting for composites...", file=stderr, flush=True)
+        session.close()
+
+    for future in futures:
+        future.result()
+
+    print("afterlife: done", file=stderr)
+    return True
 
+
+def interactive() -> None:
     print(
         "afterlife: leave any of the following blank for their defaults",
         file=stderr,
@@ -664,14 +1592,21 @@ def main() -> None:
     while (Path(csvpath).exists() and Path(csvpath).is_file()) is False:
         csvpath = input("   path to csv file (default: 'detailed.csv'): ")
 
-    global EXPORT_PREFIX, EXPORT_SUFFIX, TARGET_LAYER
     _prefix = input(f"   export prefix (default: '{EXPORT_PREFIX}'): ")
     _suffix = input(f"   export suffix (default: '{EXPORT_SUFFIX}'): ")
     _target = input(f"   target layer  (default: '{TARGET_LAYER}'): ")
+    _layered = input(
+        f"   layered export (default: '{'y' if EXPORT_LAYERED else 'n'}'): "
+    )
+    _workers = input("   workers       (default: this illustrator only): ")
 
-    EXPORT_PREFIX = _prefix if _prefix != "" else EXPORT_PREFIX
-    EXPORT_SUFFIX = _suffix if _suffix != "" else EXPORT_SUFFIX
-    TARGET_LAYER = _target if _target != "" else TARGET_LAYER
+    layout = Layout(
+        target_layer=_target if _target != "" else TARGET_LAYER,
+        prefix=_prefix if _prefix != "" else EXPORT_PREFIX,
+        suffix=_suffix if _suffix != "" else EXPORT_SUFFIX,
+    )
+    layered = _layered.lower().startswith("y") if _layered != "" else EXPORT_LAYERED
+    workers: list[str] = [w.strip() for w in _workers.split(",") if w.strip() != ""]
 
     data: list[AfterlifeInformation] = [i for i in parse_csv(Path(csvpath))]
     print(f"afterlife: loaded {len(data)} entries", file=stderr)
@@ -689,15 +1624,210 @@ def main() -> None:
     while (query not in names) and (query != "*"):
         query = input("> ").lower()
 
-    if query == "*":
-        for p in data:
-            printingpress(p, document=ai.ActiveDocument)
-    else:
-        printingpress(
-            [i for i in data if i.name.lower() == query][0], document=ai.ActiveDocument
+    selected: list[AfterlifeInformation] = (
+        data if query == "*" else [i for i in data if i.name.lower() == query][:1]
+    )
+
+    press(selected, ExportSettings([layout], layered=layered), workers)
+
+
+def check_config(config: Any) -> str | None:
+    # returns what's wrong with a loaded config file, if anything
+    if not isinstance(config, dict):
+        return "config file must be a json object"
+
+    def _strings(value: Any) -> bool:
+        return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+    def _layout(value: Any) -> bool:
+        return isinstance(value, str) or (
+            isinstance(value, dict)
+            and value.keys() <= set(Layout._fields)
+            and all(isinstance(v, str) for v in value.values())
         )
 
-    print("afterlife: done", file=stderr)
+    for key, value in config.items():
+        match key:
+            case "csv" | "template" | "backend":
+                valid, expected = isinstance(value, str), "a string"
+            case "layered":
+                valid, expected = isinstance(value, bool), "true or false"
+            case "shard_size":
+                valid, expected = (
+                    isinstance(value, int)
+                    and not isinstance(value, bool)
+                    and value >= 1
+                ), "a whole number of at least 1"
+            case "people" | "workers":
+                valid, expected = _strings(value), "a list of strings"
+            case "layouts":
+                valid, expected = (
+                    isinstance(value, list) and all(_layout(v) for v in value)
+                ), (
+                    "a list of 'LAYER[:PREFIX[:SUFFIX]]' strings, or objects with "
+                    f"any of {', '.join(repr(f) for f in Layout._fields)} as strings"
+                )
+            case _:
+                return f"unknown config key '{key}'"
+
+        if not valid:
+            return f"config key '{key}' must be {expected}"
+
+    return None
+
+
+def positive_int(value: str) -> int:
+    if (number := int(value)) < 1:
+        raise ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
+
+def main(arguments: list[str] | None = None) -> None:
+    parser = ArgumentParser(
+        prog="sinsandvirtues",
+        description="renders everyone in the csv with every given layout, "
+        "or asks for everything interactively when run without arguments",
+    )
+    parser.add_argument(
+        "csv",
+        nargs="?",
+        type=Path,
+        help="path to csv file (default: 'detailed.csv')",
+    )
+    parser.add_argument(
+        "-c",
+        "--config",
+        type=Path,
+        help="json file with defaults for any of the other options, keyed as "
+        "'csv', 'people', 'layouts', 'layered', 'template', 'backend', 'workers' "
+        "or 'shard_size'",
+    )
+    parser.add_argument(
+        "-p",
+        "--people",
+        nargs="+",
+        metavar="NAME",
+        help="names or globs of who to render (default: everyone)",
+    )
+    parser.add_argument(
+        "-l",
+        "--layout",
+        action="extend",
+        nargs="+",
+        dest="layouts",
+        metavar="LAYER[:PREFIX[:SUFFIX]]",
+        help="target layers to render with, each optionally with its own export "
+        f"prefix and suffix (default: '{TARGET_LAYER}')",
+    )
+    parser.add_argument(
+        "--layered",
+        action=BooleanOptionalAction,
+        default=None,
+        help="composite per-person layers over once-exported templates in python",
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        metavar="SPEC",
+        help="renderer to use when not using workers: "
+        "'com' (default), 'com@machine' or 'dryrun'",
+    )
+    parser.add_argument(
+        "-t",
+        "--template",
+        type=Path,
+        help="illustrator file to open in renderers without an open document "
+        f"(default: '{FILE_TEMPLATE.name}' next to this script)",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        nargs="+",
+        metavar="SPEC",
+        help="spread everyone over these renderers in their own processes",
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=positive_int,
+        metavar="N",
+        help="how many people to hand a worker at a time (default: 1)",
+    )
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        help="only parse the csv and list who is in it",
+    )
+
+    arguments = argv[1:] if arguments is None else arguments
+    if len(arguments) == 0:
+        interactive()
+        return
+
+    args = parser.parse_args(arguments)
+
+    config: dict[str, Any] = {}
+    if args.config is not None:
+        try:
+            with open(args.config, "r", encoding="utf-8") as file:
+                config = load(file)
+        except (OSError, JSONDecodeError) as exc:
+            parser.error(f"could not read config file '{args.config}': {exc}")
+
+        if (problem := check_config(config)) is not None:
+            parser.error(f"{problem}, in '{args.config}'")
+
+    def option(name: str, default: Any) -> Any:
+        # flags take precedence over the config file
+        if (value := getattr(args, name)) is not None:
+            return value
+        return config.get(name, default)
+
+    csvpath = Path(option("csv", "detailed.csv"))
+    if not csvpath.is_file():
+        parser.error(f"csv file '{csvpath}' does not exist")
+
+    data: list[AfterlifeInformation] = [i for i in parse_csv(csvpath)]
+    print(f"afterlife: loaded {len(data)} entries", file=stderr)
+
+    if args.list:
+        print("\n".join(sorted(i.name.lower() for i in data)))
+        return
+
+    selected = select_people(data, option("people", ["*"]))
+    if len(selected) == 0:
+        parser.error("no one to render")
+
+    layouts: list[Layout] = [
+        Layout(**layout) if isinstance(layout, dict) else Layout.parse(layout)
+        for layout in option("layouts", [TARGET_LAYER])
+    ]
+    if len(layouts) == 0:
+        parser.error("no layouts to render with")
+
+    if len({(layout.prefix, layout.suffix) for layout in layouts}) != len(layouts):
+        parser.error("layouts need different export prefixes or suffixes")
+
+    backend: str = option("backend", "com")
+    workers: list[str] = option("workers", [])
+    try:
+        parse_spec(backend)
+        if len(workers) > 0:
+            check_workers(workers)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    if not press(
+        selected,
+        ExportSettings(
+            layouts,
+            layered=option("layered", EXPORT_LAYERED),
+            template=Path(option("template", FILE_TEMPLATE)).absolute(),
+        ),
+        workers=workers,
+        backend=backend,
+        shard_size=option("shard_size", 1),
+    ):
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
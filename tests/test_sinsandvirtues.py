@@ -0,0 +1,501 @@
+import os
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+import sinsandvirtues
+from sinsandvirtues import (
+    DYNAMIC_VARIANTS,
+    STATIC_VARIANTS,
+    AfterlifeInformation,
+    AfterlifeValues,
+    Compositor,
+    DryRunSession,
+    ExportSettings,
+    Layout,
+    check_config,
+    find_artboard,
+    gathered,
+    main,
+    plan_staging,
+    schedule,
+    select_people,
+)
+
+EXAMPLE_CSV = Path(__file__).parent.parent.joinpath("detailed-example.csv")
+
+SETTINGS = ExportSettings([Layout()])
+
+
+def person(name: str) -> AfterlifeInformation:
+    values = AfterlifeValues(*[3.0] * 14, n=1)
+    return AfterlifeInformation(name, values, values, values, values)
+
+
+class FlakySession:
+    # 'fails' fails and 'crashes' kills the process, but only on worker 0,
+    # and 'always' fails everywhere
+
+    def __init__(self, worker: int) -> None:
+        self.worker = worker
+
+    def render(self, data: AfterlifeInformation) -> Future[list[Path]]:
+        if data.name == "always" or (self.worker == 0 and data.name == "fails"):
+            raise RuntimeError(f"{data.name} on worker {self.worker}")
+        if self.worker == 0 and data.name == "crashes":
+            os._exit(1)
+        return gathered([], [Path(f"{data.name}.png")])
+
+    def close(self) -> None:
+        pass
+
+
+def flaky_worker(worker: int, spec: str, *args: Any) -> None:
+    # runs in the spawned worker process, so patch its copy of the module
+    def open_session(spec: str, *_: Any) -> FlakySession:
+        if spec == "com":
+            raise OSError("no illustrator here")
+        return FlakySession(worker)
+
+    sinsandvirtues.open_session = open_session  # type: ignore[assignment]
+    sinsandvirtues.renderer_worker(worker, spec, *args)
+
+
+class Item:
+    # a stand-in for illustrator page items and layers, counting what is set
+    # on it (and how often) past construction
+
+    def __init__(self, name: str, typename: str = "PathItem", **attributes: Any):
+        self.__dict__.update(Name=name, Typename=typename, writes=0, **attributes)
+
+    def __setattr__(self, attribute: str, value: Any) -> None:
+        self.__dict__["writes"] += 1
+        self.__dict__[attribute] = value
+
+
+class Items:
+    # a stand-in for com collections, 1-indexed or by name
+
+    def __init__(self, *items: Any) -> None:
+        self.items = items
+        self.Count = len(items)
+
+    def __call__(self, key: int | str) -> Any:
+        if isinstance(key, int):
+            return self.items[key - 1]
+        return next(item for item in self.items if item.Name == key)
+
+
+def document() -> Any:
+    # a target layer with one item of every kind the variants tell apart
+    pair = Item(
+        "LustChastity",
+        "GroupItem",
+        PageItems=Items(
+            Item("Left1", Hidden=False),
+            Item("LeftScore", Hidden=False),
+            Item("Left", Hidden=False),
+            Item("Art", Hidden=False),
+            Item("Unused", Hidden=True),
+        ),
+    )
+    working = Item(
+        "Working",
+        "Layer",
+        Visible=True,
+        PageItems=Items(
+            Item("", "PluginItem", Hidden=False),
+            Item("Background", Hidden=False),
+            pair,
+        ),
+    )
+    return Item("", "Document", Layers=Items(working, Item("Other", Visible=True)))
+
+
+def png(path: Path, colour: tuple[int, ...], mode: str = "RGB") -> Path:
+    image = pytest.importorskip("PIL.Image")
+    image.new(mode, (10, 10), colour).save(path)
+    return path
+
+
+def done(path: Path) -> Future[Path]:
+    future: Future[Path] = Future()
+    future.set_result(path)
+    return future
+
+
+@pytest.fixture
+def flaky(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Path:
+    monkeypatch.setattr(sinsandvirtues, "renderer_worker", flaky_worker)
+    monkeypatch.setattr(sinsandvirtues, "DIR_OUTPUT", tmp_path)
+    return tmp_path
+
+
+def test_gathered_waits_for_every_future() -> None:
+    first: Future[Path] = Future()
+    second: Future[Path] = Future()
+    result = gathered([first, second], [Path("a.png")])
+
+    first.set_result(Path("a.png"))
+    assert not result.done()
+    second.set_result(Path("a.png"))
+    assert result.result() == [Path("a.png")]
+
+
+def test_gathered_fails_with_any_error() -> None:
+    first: Future[Path] = Future()
+    second: Future[Path] = Future()
+    result = gathered([first, second], [])
+
+    first.set_exception(ValueError("nope"))
+    second.set_result(Path("a.png"))
+    with pytest.raises(ValueError, match="nope"):
+        result.result()
+
+
+def test_gathered_without_futures_is_done() -> None:
+    assert gathered([], [Path("a.png")]).result() == [Path("a.png")]
+
+
+def test_schedule_dryrun(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(sinsandvirtues, "DIR_OUTPUT", tmp_path)
+    names = ["mark", "lumi", "anterillynn"]
+
+    manifest = schedule(
+        [person(name) for name in names], ["dryrun", "dryrun"], SETTINGS, shard_size=2
+    )
+
+    assert sorted(manifest["rendered"]) == sorted(names)
+    assert manifest["failed"] == {}
+    assert {entry["worker"] for entry in manifest["rendered"].values()} <= {0, 1}
+    assert tmp_path.joinpath("manifest.json").is_file()
+
+
+def test_schedule_retries_on_another_worker(flaky: Path) -> None:
+    manifest = schedule([person("fails")], ["dryrun", "dryrun"], SETTINGS)
+
+    entry = manifest["rendered"]["fails"]
+    assert entry["worker"] == 1
+    assert entry["attempts"] == 2
+    assert len(entry["errors"]) == 1
+    assert "worker 0" in entry["errors"][0]
+
+
+def test_schedule_gives_up(flaky: Path) -> None:
+    manifest = schedule([person("always"), person("fine")], ["dryrun"], SETTINGS)
+
+    assert list(manifest["rendered"]) == ["fine"]
+    assert list(manifest["failed"]) == ["always"]
+
+
+def test_schedule_worker_that_cannot_start(flaky: Path) -> None:
+    manifest = schedule(
+        [person("mark"), person("lumi")], ["com", "dryrun"], SETTINGS, shard_size=2
+    )
+
+    assert manifest["failed"] == {}
+    assert {entry["worker"] for entry in manifest["rendered"].values()} == {1}
+
+
+def test_schedule_worker_that_dies(flaky: Path) -> None:
+    # worker 0 reports 'before' right before it dies on 'crashes', and that
+    # report must not get lost (and 'before' rendered again elsewhere)
+    manifest = schedule(
+        [person("before"), person("crashes")],
+        ["dryrun", "dryrun"],
+        SETTINGS,
+        shard_size=2,
+    )
+
+    assert manifest["failed"] == {}
+    assert manifest["rendered"]["before"]["worker"] == 0
+    assert manifest["rendered"]["before"]["attempts"] == 1
+    assert manifest["rendered"]["crashes"]["worker"] == 1
+    assert manifest["rendered"]["crashes"]["attempts"] == 2
+    assert "exited with code 1" in manifest["rendered"]["crashes"]["errors"][0]
+
+
+@pytest.mark.parametrize(
+    "workers, shard_size",
+    [
+        ([], 1),
+        (["dryrun"], 0),
+        (["dryrun"], -1),
+        (["com", "com@"], 1),
+        (["dryrun@machine"], 1),
+        (["nonsense"], 1),
+    ],
+)
+def test_schedule_rejects(workers: list[str], shard_size: int) -> None:
+    with pytest.raises(ValueError):
+        schedule([person("mark")], workers, SETTINGS, shard_size=shard_size)
+
+
+@pytest.mark.parametrize(
+    "spec, layout",
+    [
+        ("Working", Layout("Working", "afterlife-", "")),
+        ("WorkingAlt::-alt", Layout("WorkingAlt", "afterlife-", "-alt")),
+        ("WorkingAlt:alt-:-x", Layout("WorkingAlt", "alt-", "-x")),
+        (":x", Layout("Working", "x", "")),
+        ("a:b:c:d", Layout("a", "b", "c:d")),
+    ],
+)
+def test_layout_parse(spec: str, layout: Layout) -> None:
+    assert Layout.parse(spec) == layout
+
+
+def test_select_people() -> None:
+    data = [person("Mark"), person("lumi"), person("mary"), person("anterillynn")]
+
+    selected = select_people(data, ["ma*", "LUMI", "nobody"])
+
+    assert [i.name for i in selected] == ["Mark", "lumi", "mary"]
+    assert select_people(data, ["*"]) == data
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {},
+        {
+            "csv": "detailed.csv",
+            "people": ["mark", "l*"],
+            "layouts": ["Working", {"target_layer": "WorkingAlt", "suffix": "-alt"}],
+            "layered": True,
+            "template": "sinsandvirtues.ai",
+            "backend": "dryrun",
+            "workers": ["com", "com@render-pc"],
+            "shard_size": 2,
+        },
+    ],
+)
+def test_check_config_accepts(config: dict[str, Any]) -> None:
+    assert check_config(config) is None
+
+
+@pytest.mark.parametrize(
+    "config, problem",
+    [
+        ([], "json object"),
+        ({"people": "mark"}, "'people'"),
+        ({"workers": "com"}, "'workers'"),
+        ({"layouts": "Working"}, "'layouts'"),
+        ({"layouts": [{"target_layer": "Working", "extra": "x"}]}, "'layouts'"),
+        ({"layouts": [{"target_layer": 1}]}, "'layouts'"),
+        ({"layered": "yes"}, "'layered'"),
+        ({"shard_size": 0}, "'shard_size'"),
+        ({"shard_size": True}, "'shard_size'"),
+        ({"shard-size": 2}, "unknown config key 'shard-size'"),
+    ],
+)
+def test_check_config_rejects(config: Any, problem: str) -> None:
+    assert problem in (check_config(config) or "")
+
+
+def test_main_list(capsys: pytest.CaptureFixture[str]) -> None:
+    main([str(EXAMPLE_CSV), "--list"])
+
+    assert capsys.readouterr().out.split() == ["example"]
+
+
+def test_dryrun_renders_every_layout() -> None:
+    session = DryRunSession(
+        ExportSettings([Layout("Working"), Layout("WorkingAlt", suffix="-alt")])
+    )
+
+    outputs = session.render(person("example")).result()
+
+    assert [path.name for path in outputs] == [
+        "afterlife-example.png",
+        "afterlife-example-var2.png",
+        "afterlife-example-var1.png",
+        "afterlife-example-alt.png",
+        "afterlife-example-alt-var2.png",
+        "afterlife-example-alt-var1.png",
+    ]
+
+
+def test_main_dryrun() -> None:
+    main([str(EXAMPLE_CSV), "-b", "dryrun", "-l", "Working", "WorkingAlt::-alt"])
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        ["-b", "nonsense"],
+        ["-w", "com", "com@"],
+        ["-l", "Working", "Working"],
+        ["-p", "nobody"],
+        ["--shard-size", "0"],
+    ],
+)
+def test_main_rejects(arguments: list[str]) -> None:
+    with pytest.raises(SystemExit) as exc:
+        main([str(EXAMPLE_CSV), *arguments])
+
+    assert exc.value.code == 2
+
+
+def test_main_rejects_config(tmp_path: Path) -> None:
+    config = tmp_path.joinpath("config.json")
+    config.write_text('{"workers": "com"}')
+
+    with pytest.raises(SystemExit) as exc:
+        main([str(EXAMPLE_CSV), "-c", str(config)])
+
+    assert exc.value.code == 2
+
+
+@pytest.mark.parametrize(
+    "group, item, shown",
+    [
+        # shown in the main, var2 and var1 static exports
+        ("", Item("Background"), (True, True, True)),
+        ("", Item("", "PluginItem"), (True, True, False)),
+        ("LustChastity", Item("Art"), (True, True, True)),
+        ("LustChastity", Item("Left"), (True, False, False)),
+        ("Numbers", Item("Label"), (True, False, False)),
+        ("Numbers", Item("All"), (False, False, False)),
+        ("LustChastity", Item("Left1"), (False, False, False)),
+        ("LustChastity", Item("LeftScore"), (False, False, False)),
+        ("Header", Item("TargetName"), (False, False, False)),
+    ],
+)
+def test_static_variants(group: str, item: Item, shown: tuple[bool, ...]) -> None:
+    assert list(STATIC_VARIANTS) == ["", "-var2", "-var1"]
+    assert tuple(show(group, item) for show in STATIC_VARIANTS.values()) == shown
+
+
+@pytest.mark.parametrize(
+    "group, item, shown",
+    [
+        # shown in the dynamic and dynamic shapes exports
+        ("LustChastity", Item("Left1"), (True, True)),
+        ("Header", Item("TargetName"), (True, True)),
+        ("LustChastity", Item("LeftScore"), (True, False)),
+        ("Numbers", Item("All"), (True, False)),
+        ("LustChastity", Item("Left"), (False, False)),
+        ("", Item("", "PluginItem"), (False, False)),
+    ],
+)
+def test_dynamic_variants(group: str, item: Item, shown: tuple[bool, ...]) -> None:
+    assert tuple(show(group, item) for show in DYNAMIC_VARIANTS.values()) == shown
+
+
+def test_plan_staging() -> None:
+    staging = plan_staging(document(), "Working")
+    names = [item.Name for item, _ in staging.items]
+
+    assert names == [
+        "Other", "", "Background", "Left1", "LeftScore", "Left", "Art", "Unused"
+    ]
+    assert [attribute for _, attribute in staging.items] == ["Visible"] + ["Hidden"] * 7
+    # hidden in the template, so hidden in every variant
+    assert all(values[-1] for values in staging.variants.values())
+    assert staging.variants[""] == (True, False, False, True, True, False, False, True)
+    assert staging.variants["-var1"] == (
+        True, True, False, True, True, True, False, True
+    )
+    assert staging.variants["-dynamic"] == (
+        False, True, True, False, False, True, True, True
+    )
+
+
+def test_stage_only_toggles_what_changes(tmp_path: Path) -> None:
+    pytest.importorskip("PIL")
+    _document = document()
+    compositor = Compositor(tmp_path)
+    compositor.staging["Working"] = plan_staging(_document, "Working")
+    items = [item for item, _ in compositor.staging["Working"].items]
+
+    compositor.stage("Working", "-dynamic-shapes")
+    compositor.stage("Working", "-dynamic")
+    writes = [item.writes for item in items]
+    # only the score differs between the two
+    compositor.stage("Working", "-dynamic-shapes")
+
+    assert [item.writes - was for item, was in zip(items, writes)] == [
+        0, 0, 0, 0, 1, 0, 0, 0
+    ]
+
+    compositor.finish()
+
+    assert compositor.current == {}
+    assert [
+        getattr(item, attribute)
+        for item, attribute in compositor.staging["Working"].items
+    ] == list(compositor.staging["Working"].template)
+
+
+def test_composite(tmp_path: Path) -> None:
+    base = png(tmp_path.joinpath("base.png"), (255, 0, 0))
+    overlay = png(tmp_path.joinpath("overlay.png"), (0, 0, 255, 128), "RGBA")
+    compositor = Compositor(tmp_path)
+
+    result = compositor.composite(base, overlay, tmp_path.joinpath("out", "a.png"))
+    compositor.finish()
+
+    with compositor.image.open(result) as image:
+        assert image.mode == "RGB"
+        assert image.getpixel((0, 0)) == (127, 0, 128)
+
+
+@pytest.mark.parametrize(
+    "normal, layered, matches",
+    [
+        ((0, 0, 0), (0, 0, 0), True),
+        ((0, 0, 0), (0, 0, 16), True),
+        # luminance would all but ignore these
+        ((0, 0, 0), (0, 0, 255), False),
+        ((0, 0, 0), (100, 0, 0), False),
+    ],
+)
+def test_verify(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    normal: tuple[int, ...],
+    layered: tuple[int, ...],
+    matches: bool,
+) -> None:
+    monkeypatch.setattr(sinsandvirtues, "DIR_OUTPUT", tmp_path)
+    tmp_path.joinpath("check").mkdir()
+    png(tmp_path.joinpath("afterlife-a.png"), normal)
+    futures = [done(png(tmp_path.joinpath("check", "afterlife-a.png"), layered))]
+    compositor = Compositor(tmp_path)
+
+    if matches:
+        compositor.verify(Layout(), "a", futures)
+    else:
+        with pytest.raises(RuntimeError, match="differs from the normal export"):
+            compositor.verify(Layout(), "a", futures)
+
+    assert (Layout().target_layer in compositor.verified) is matches
+
+
+def test_find_artboard() -> None:
+    # two 100x100 artboards side by side, y going up
+    def layer(name: str, *bounds: tuple[int, int, int, int]) -> Item:
+        return Item(name, PageItems=Items(*[Item("", VisibleBounds=b) for b in bounds]))
+
+    _document = Item(
+        "",
+        "Document",
+        Layers=Items(
+            layer("Working", (110, 90, 150, 60), (120, 80, 130, 70)),
+            layer("Outside", (300, 50, 310, 40)),
+            layer("Empty"),
+        ),
+        Artboards=Items(
+            Item("", ArtboardRect=(0, 100, 100, 0)),
+            Item("", ArtboardRect=(100, 100, 200, 0)),
+        ),
+    )
+
+    assert find_artboard(_document, "Working") == 1
+    with pytest.raises(ValueError, match="not on any artboard"):
+        find_artboard(_document, "Outside")
+    with pytest.raises(AssertionError, match="is empty"):
+        find_artboard(_document, "Empty")